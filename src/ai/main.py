@@ -16,20 +16,30 @@ Command-line AI actor with essential tooling, backed by a local LMStudio.
 
 import os
 import sys
+import io
+import codecs
 import traceback
 import argparse
-import textwrap
+import atexit
 import subprocess
 import shlex
+import shutil
+import tempfile
+import re
+import heapq
+import itertools
+import mmap
+import json
+import time
+import sqlite3
+import threading
 import stat as stat_module
+from array import array
 from pathlib import Path
-from functools import wraps
-
-import lmstudio as lms
-import kagiapi as kagi
-import readabilipy
-import markdownify
-import requests
+from functools import wraps, lru_cache
+from operator import attrgetter
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 WD = os.getcwd()
@@ -43,33 +53,54 @@ def main():
     act_parser.add_argument('prompt', nargs='?', help="Prompt text", default="")
     act_parser.add_argument('--model', default='qwen/qwen3-30b-a3b-2507', help="Custom model to use")
     act_parser.add_argument('--no-sandbox', action='store_true', help="Disable sandbox (runs sandboxed by default)")
+    act_parser.add_argument('--draft', help="Draft model for speculative decoding")
+    act_parser.add_argument('--draft-tokens', type=int, help="Tokens to draft per step (LM Studio decides by default)")
 
     ask_parser = subparsers.add_parser('ask', help="Respond without using tools")
     ask_parser.add_argument('prompt', nargs='?', help="Prompt text", default="")
     ask_parser.add_argument('--model', default='openai/gpt-oss-20b', help="Custom model to use")
     ask_parser.add_argument('--no-sandbox', action='store_true', help="Disable sandbox (runs sandboxed by default)")
+    ask_parser.add_argument('--draft', help="Draft model for speculative decoding")
+    ask_parser.add_argument('--draft-tokens', type=int, help="Tokens to draft per step (LM Studio decides by default)")
 
     args = parser.parse_args()
 
+    if args.draft_tokens is not None and not args.draft:
+        parser.error("--draft-tokens requires --draft")
+
+    if args.draft_tokens is not None and args.draft_tokens < 1:
+        parser.error("--draft-tokens must be at least 1")
+
     if not args.no_sandbox:
         sandbox_exec() # never returns
 
     arg_prompt = args.prompt or ""
-    stdin_prompt = sys.stdin.read().strip() if not sys.stdin.isatty() else ''
+    stdin_prompt = sys.stdin.buffer.read().decode('utf-8', errors='replace').strip() if not sys.stdin.isatty() else ''
 
     prompt = f"{arg_prompt}\n\n{stdin_prompt}".strip()
 
     if not prompt:
         sys.exit(1)
 
+    import lmstudio as lms # slow to import, and not needed for --help or before re-executing in the sandbox
+
     model = lms.llm(args.model)
 
     config = {} # hmm
+    draft_tuner = None
+
+    if args.draft:
+        config['draftModel'] = args.draft
+
+        if args.draft_tokens is not None:
+            config['speculativeDecodingNumDraftTokensExact'] = args.draft_tokens
+        elif args.command == 'act':
+            draft_tuner = DraftTuner(config)
 
     if args.command == 'ask':
         respond(model, prompt, config)
     else:
-        act(model, prompt, config)
+        act(model, prompt, config, draft_tuner)
 
 
 # --------------------------------------------------------------------------------------------------
@@ -80,41 +111,112 @@ def respond(model, prompt, config):
 
     try:
         for fragment in prediction_stream:
-            print(fragment.content, end="")
+            stream.write(fragment.content)
     except Exception as e:
         prediction_stream.cancel()
         raise e
+    finally:
+        stream.flush()
 
     print()
 
 
-def act(model: lms.LLM, prompt, config):
+def act(model, prompt, config, draft_tuner=None):
+    import lmstudio as lms
+
     chat = lms.Chat(prompt)
 
-    model.act(
-        chat,
-        [
-            web_search,
-            web_fetch,
-            web_fetch_summary,
-            fs_stat,
-            fs_read,
-            fs_write,
-            fs_list,
-            fs_search,
-            fs_replace,
-            fs_mkdir,
-            fs_rm,
-            fs_pwd,
-            shell,
-        ],
-        on_prediction_fragment = lambda f, index: print(f.content, end=""),
-        on_message = chat.append
-    )
+    try:
+        model.act(
+            chat,
+            act_tools,
+            config = config,
+            on_prediction_completed = draft_tuner.update if draft_tuner else None,
+            on_prediction_fragment = lambda f, index: stream.write(f.content),
+            on_message = chat.append
+        )
+    finally:
+        stream.flush()
 
     print()
 
 
+class DraftTuner:
+    """
+    Adjusts the number of drafted tokens between act() rounds, following the draft acceptance rate.
+
+    With acceptance rate `a`, drafting `k` tokens yields (1 - a^(k+1)) / (1 - a) tokens per step.
+    Drafting more pays off when most drafts are accepted, and costs time when they're not.
+    LM Studio reads `config` again for each round, so updating it takes effect on the next one.
+    """
+
+    def __init__(self, config, rate=0.5, smoothing=0.5, max_tokens=8):
+        self.config = config
+        self.rate = rate
+        self.smoothing = smoothing
+        self.max_tokens = max_tokens
+
+    def update(self, result):
+        drafted = result.stats.total_draft_tokens_count
+        accepted = result.stats.accepted_draft_tokens_count
+
+        if not drafted or accepted is None:
+            return
+
+        self.rate = self.smoothing * self.rate + (1 - self.smoothing) * (accepted / drafted)
+
+        tokens = round(self.rate / (1 - self.rate)) if self.rate < 1 else self.max_tokens
+        self.config['speculativeDecodingNumDraftTokensExact'] = max(1, min(self.max_tokens, tokens))
+
+
+# --------------------------------------------------------------------------------------------------
+# Output
+
+class StreamPrinter:
+    """
+    Prints streamed text in batches, instead of one write per fragment. Text is held until a line
+    is complete, `size` characters are pending or `interval` seconds passed (checked as fragments
+    arrive), whatever comes first.
+    """
+
+    def __init__(self, interval=0.05, size=4096):
+        self.interval = interval
+        self.size = size
+        self.parts = []
+        self.pending = 0
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def write(self, text):
+        with self.lock:
+            self.parts.append(text)
+            self.pending += len(text)
+
+            if (
+                "\n" in text or
+                self.pending >= self.size or
+                time.monotonic() - self.flushed_at >= self.interval
+            ):
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.parts:
+            sys.stdout.write("".join(self.parts))
+            self.parts.clear()
+            self.pending = 0
+
+        sys.stdout.flush()
+        self.flushed_at = time.monotonic()
+
+
+stream = StreamPrinter()
+atexit.register(stream.flush) # whatever was held back, in case we exit mid-stream
+
+
 # --------------------------------------------------------------------------------------------------
 # Helpers
 
@@ -122,6 +224,7 @@ def tooldef(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         try:
+            stream.flush() # anything the model said before calling this tool goes first
             print('!', func.__name__, kwargs)
             return func(*args, **kwargs)
         except Exception as e:
@@ -177,12 +280,22 @@ class ResponseTooLong(ToolError):
 class RequestFailed(ToolError):
     message = "HTTP request failed: {error}"
 
+class SearchFailed(ToolError):
+    message = "search failed: {error}"
+
+class MissingApiKey(ToolError):
+    message = "environment variable {name} is not set"
+
+class LessThanOne(ToolError):
+    message = "{name} must be at least 1"
+
 
 # --------------------------------------------------------------------------------------------------
 # Shell
 
-shell_allowed = []
-shell_forbidden = []
+shell_allowed = set()
+shell_forbidden = set()
+shell_max_output = 1_000_000
 
 
 @tooldef
@@ -208,7 +321,7 @@ def shell(command: str, arguments: list[str]):
         response = input("> ").strip().upper()
 
         if response == 'A': # always
-            shell_allowed.append(command)
+            shell_allowed.add(command)
 
         elif response == 'Y': # yes, this time
             pass
@@ -217,23 +330,35 @@ def shell(command: str, arguments: list[str]):
             raise CommandDenied(command=command)
 
         elif response == 'X': # never
-            shell_forbidden.append(command)
+            shell_forbidden.add(command)
             raise CommandDenied(command=command)
 
         else: # no by default
             raise CommandDenied(command=command)
 
-    result = subprocess.run(
-        [command] + arguments,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True
-    )
+    with subprocess.Popen([command] + arguments, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) as proc:
+        # Commands can print without limit. Keep only the tail, where results and errors usually are:
+        data = bytearray()
+        truncated = False
+
+        for chunk in iter(lambda: proc.stdout.read(65536), b''):
+            data += chunk
+
+            if len(data) > shell_max_output:
+                del data[:len(data) - shell_max_output]
+                truncated = True
 
-    output = result.stdout if result.stdout.strip() else "(no output)"
+        returncode = proc.wait()
 
-    if result.returncode != 0:
-        return f"Error (exit code {result.returncode}):\n{output}"
+    # Commands can print anything, don't fail on invalid output:
+    output = data.decode('utf-8', errors='replace')
+    output = output if output.strip() else "(no output)"
+
+    if truncated:
+        output = f"(truncated, showing the last {shell_max_output} bytes)\n{output}"
+
+    if returncode != 0:
+        return f"Error (exit code {returncode}):\n{output}"
 
     return f"Success (exit code 0):\n{output}"
 
@@ -262,29 +387,25 @@ def fs_stat(path: str) -> str:
     Returns attributes including size, created time, modified time, accessed time, type ('f', 'd' or 'l') and permissions.
     """
 
-    p = resolve(path)
-    if not p.exists(): raise PathDoesNotExist(path=path)
-
-    stats = p.stat()
+    resolve(path) # where the path leads, links followed, must be inside the working directory
 
-    file_type = (
-        'l' if p.is_symlink() else
-        'd' if p.is_dir() else
-        'f' if p.is_file() else
-        '?'
+    # But the path itself is what's described, so links are reported as such:
+    try:
+        stats = os.lstat(os.path.join(WD, path))
+    except FileNotFoundError:
+        raise PathDoesNotExist(path=path)
+
+    file_type = stat_type(stats.st_mode)
+
+    return (
+        f"size: {stats.st_size}\n"
+        f"created: {getattr(stats, 'st_birthtime', None)}\n"
+        f"modified: {stats.st_mtime}\n"
+        f"accessed: {stats.st_atime}\n"
+        f"type: {file_type}\n"
+        f"permissions: {stats.st_mode & 0o777:03o}"
     )
 
-    lines = [
-        f"size: {stats.st_size}",
-        f"created: {getattr(stats, 'st_birthtime', None)}",
-        f"modified: {stats.st_mtime}",
-        f"accessed: {stats.st_atime}",
-        f"type: {file_type}",
-        f"permissions: {oct(stats.st_mode)[-3:]}",
-    ]
-
-    return "\n".join(lines)
-
 
 @tooldef
 def fs_read(path: str, start: int = 0, end: int = -1) -> str:
@@ -301,21 +422,138 @@ def fs_read(path: str, start: int = 0, end: int = -1) -> str:
     """
 
     p = resolve(path)
-    if not p.exists(): raise PathDoesNotExist(path=path)
-    if not p.is_file(): raise PathIsNotFile(path=path)
 
-    with open(p, 'r') as f:
-        lines = f.readlines()
+    # Open first and ask the open file what it is. O_NONBLOCK keeps the open from waiting on a FIFO:
+    try:
+        fd = os.open(p, os.O_RDONLY | os.O_NONBLOCK)
+    except FileNotFoundError:
+        raise PathDoesNotExist(path=path)
+
+    stats = os.fstat(fd)
+
+    if not stat_module.S_ISREG(stats.st_mode):
+        os.close(fd)
+        raise PathIsNotFile(path=path)
 
+    with open(fd, 'rb', buffering=0) as f:
+        return read_lines(p, f, stats, start, end)
+
+
+def read_lines(p, f, stats, start, end):
+    if start == 0 and end == -1:
+        # Reading everything, no need to find lines:
+        return f.read().decode('utf-8', errors='replace')
+
+    if start >= 0 and end >= 0 and stats.st_size > 0 and not has_line_offsets(p, stats):
+        # Reading the head of a file we haven't indexed. Only scan forward as far as needed:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first = skip_lines(mm, 0, start)
+            last = skip_lines(mm, first, end + 1 - start)
+            return mm[first:last].decode('utf-8', errors='replace')
+
+    if start < 0 and end < 0 and stats.st_size > 0 and not has_line_offsets(p, stats):
+        # Reading the tail of a file we haven't indexed. Only scan back as far as needed:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            first = tail_offset(mm, -start)
+            last = tail_offset(mm, -end - 1) if end < -1 else len(mm)
+
+            if last > 0: # else `end` is before the first line, and line_range() has the last word
+                return mm[first:last].decode('utf-8', errors='replace')
+
+    offsets = line_offsets(p, f, stats)
+    first, last = line_range(len(offsets) - 1, start, end)
+
+    if first >= last:
+        return ""
+
+    f.seek(offsets[first])
+    data = f.read(offsets[last] - offsets[first])
+
+    return data.decode('utf-8', errors='replace')
+
+
+def line_range(count, start, end):
+    # Turn fs_read's inclusive, possibly negative, start/end into a [first, last) range of lines
     if end == -1:
-        sliced = lines[start:]
+        stop = count
     elif end < -1:
-        sliced = lines[start:len(lines) + 1 + end]
+        stop = count + 1 + end
     else:
-        sliced = lines[start:end + 1]
+        stop = end + 1
+
+    first, last, _ = slice(start, stop).indices(count)
+    return first, last
+
+
+fs_read_offsets = {} # path -> (file version, line offsets), least recently used first
+fs_read_offsets_size = 32
+
+def line_offsets(p, f, stats):
+    # Byte offsets where each line starts, plus the file size at the end. Cached per path until the
+    # file changes:
+    if has_line_offsets(p, stats):
+        fs_read_offsets[p] = fs_read_offsets.pop(p) # now the most recently used
+        return fs_read_offsets[p][1]
+
+    offsets = array('Q', [0])
+
+    if stats.st_size > 0: # can't mmap an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = mm.find(b'\n')
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = mm.find(b'\n', pos + 1)
 
-    return "".join(sliced)
+    if offsets[-1] != stats.st_size: # last line has no newline
+        offsets.append(stats.st_size)
 
+    fs_read_offsets.pop(p, None)
+    fs_read_offsets[p] = (file_version(stats), offsets)
+
+    if len(fs_read_offsets) > fs_read_offsets_size:
+        del fs_read_offsets[next(iter(fs_read_offsets))]
+
+    return offsets
+
+
+def has_line_offsets(p, stats):
+    cached = fs_read_offsets.get(p)
+    return cached is not None and cached[0] == file_version(stats)
+
+
+def file_version(stats):
+    # mtime alone is too coarse to notice a quick same-size edit, but a replaced file is a new inode
+    return (stats.st_dev, stats.st_ino, stats.st_mtime_ns, stats.st_ctime_ns, stats.st_size)
+
+
+def skip_lines(mm, pos, count):
+    # Byte offset after `count` more lines starting at `pos`, scanning forward:
+    for _ in range(count):
+        pos = mm.find(b'\n', pos) + 1
+        if pos == 0:
+            return len(mm)
+
+    return pos
+
+
+def tail_offset(mm, count):
+    # Byte offset where the last `count` lines start, scanning backwards from the end:
+    pos = len(mm)
+
+    if mm[pos - 1:pos] == b'\n':
+        pos -= 1 # the final newline ends the last line, it doesn't start a new one
+
+    for _ in range(count):
+        pos = mm.rfind(b'\n', 0, pos)
+        if pos == -1:
+            return 0
+
+    return pos + 1
+
+
+# There's no way to read the umask without setting it:
+umask = os.umask(0)
+os.umask(umask)
 
 @tooldef
 def fs_write(path: str, content: str, mode: str = 'w') -> str:
@@ -332,56 +570,103 @@ def fs_write(path: str, content: str, mode: str = 'w') -> str:
 
     p = resolve(path)
 
-    with open(p, mode) as f:
-        f.write(content)
+    # Overwrites go through a temporary file, so the target is never seen (or left) half-written:
+    if mode == 'w':
+        write_atomic(p, content.encode('utf-8'))
+
+    elif mode == 'a':
+        fd = os.open(p, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o666)
+
+        try:
+            write_all(fd, content.encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    else:
+        with open(p, mode) as f:
+            f.write(content)
 
+    fs_read_offsets.pop(p, None) # in case the file changed without its version showing it
     return f"Successfully wrote {len(content)} characters to {path} (mode: {mode})"
 
 
+fs_list_workers = 32
+
 @tooldef
-def fs_list(path: str = ".") -> str:
+def fs_list(path: str = ".", limit: int = 1000) -> str:
     """
     List files and directories in the given directory path.
 
     Arguments:
-        path: the directory path to list, defaults to current directory
+        path : the directory path to list, defaults to current directory
+        limit: the maximum number of entries to list, in name order, defaults to 1000
 
     Returns a table with columns: size, type ('f', 'd' or 'l'), and name.
     """
 
-    p = resolve(path)
-    if not p.exists(): raise PathDoesNotExist(path=path)
-    if not p.is_dir(): raise PathIsNotDirectory(path=path)
+    if limit < 1:
+        raise LessThanOne(name='limit')
 
-    entries = []
-    for item in sorted(p.iterdir(), key=lambda x: x.name):
-        try:
-            stats = item.stat()
-        except:
-            continue # could be a broken symlink or a restricted file, for example
+    p, _ = resolve_stat(path, require='dir')
 
-        size = stats.st_size
+    # Only the first entries by name are kept, the rest are just counted as they go by:
+    counter = itertools.count()
 
-        file_type = (
-            'l' if item.is_symlink() else
-            'd' if item.is_dir() else
-            'f' if item.is_file() else
-            '?'
-        )
+    with os.scandir(p) as it:
+        items = heapq.nsmallest(limit, (item for item, _ in zip(it, counter)), key=attrgetter('name'))
 
-        entries.append((size, file_type, item.name))
+    total = next(counter)
 
-    if not entries:
-        return ""
+    # Stat entries in parallel, which helps on slow mounts:
+    with ThreadPoolExecutor(max_workers=fs_list_workers) as pool:
+        lines = [line for line in pool.map(list_entry, items) if line]
 
-    lines = [
-        f"{str(size).rjust(12)}  {file_type}  {name.ljust(50)}"
-        for size, file_type, name in entries
-    ]
+    if total > limit:
+        lines.append(f"(truncated, {total - limit} more entries)")
 
     return "\n".join(lines)
 
 
+def list_entry(item):
+    try:
+        stats = item.stat()
+    except OSError:
+        return None # could be a broken symlink or a restricted file, for example
+
+    file_type = (
+        'l' if item.is_symlink() else
+        'd' if item.is_dir() else
+        'f' if item.is_file() else
+        '?'
+    )
+
+    return f"{stats.st_size:>12}  {file_type}  {item.name}"
+
+
+fs_search_max_lines = 2000
+fs_search_max_bytes = 1_000_000
+fs_search_max_per_file = 200
+fs_search_max_filesize = 10_000_000
+fs_search_workers = 8
+fs_search_binary_sniff = 8192
+
+# rg understands POSIX classes like [[:digit:]], Python reads them as a nested set that never matches:
+fs_search_posix_classes = {
+    'alnum': r'a-zA-Z0-9',
+    'alpha': r'a-zA-Z',
+    'blank': r' \t',
+    'cntrl': r'\x00-\x1f\x7f',
+    'digit': r'0-9',
+    'graph': r'!-~',
+    'lower': r'a-z',
+    'print': r' -~',
+    'punct': r'!-/:-@\[-`{-~',
+    'space': r'\s',
+    'upper': r'A-Z',
+    'word': r'\w',
+    'xdigit': r'0-9A-Fa-f',
+}
+
 @tooldef
 def fs_search(path: str, pattern: str) -> str:
     """
@@ -391,24 +676,168 @@ def fs_search(path: str, pattern: str) -> str:
         path   : the path to search in
         pattern: the regex pattern to search for
 
-    Returns matching lines in <file>:<line>:<content> format.
+    Returns matching lines in <file>:<line>:<content> format, truncated if there are too many.
     """
 
-    p = resolve(path)
-    if not p.exists(): raise PathDoesNotExist(path=path)
+    p, stats = resolve_stat(path)
 
-    result = subprocess.run(
-        ["rg", "--line-number", "--color", "never", pattern, str(p)],
-        capture_output=True,
-        text=True
-    )
+    # The pattern is written for rg, so use it whenever it's installed, even for a single file. Without
+    # it, search in-process with Python's regex syntax and no .gitignore support:
+    is_file = stat_module.S_ISREG(stats.st_mode)
 
-    if result.returncode == 0:
-        return result.stdout
-    elif result.returncode == 1:
-        return ""  # No matches found
+    if shutil.which("rg"):
+        matches = search_rg(p, pattern, is_file)
     else:
-        return f"Error: {result.stderr}"
+        matches = search_python(p, pattern, is_file)
+
+    lines = []
+    total = 0
+
+    # Consume matches as they're found, and stop searching once we have more than we'll return:
+    for line in matches:
+        if len(lines) >= fs_search_max_lines or total + len(line) > fs_search_max_bytes:
+            lines.append(f"(truncated to {len(lines)} matches, narrow the search to see more)\n")
+            break
+
+        lines.append(line)
+        total += len(line)
+
+    matches.close()
+
+    return "".join(lines)
+
+
+def search_rg(p, pattern, is_file):
+    args = ["rg", "--line-number", "--color", "never", "--no-messages", "--max-count", str(fs_search_max_per_file)]
+
+    # Big files are skipped when searching directories, but a file asked for by name is always searched:
+    if not is_file:
+        args += ["--max-filesize", str(fs_search_max_filesize)]
+
+    proc = subprocess.Popen(
+        [*args, pattern, str(p)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+
+    found = False
+
+    # Matched lines can come from files in any encoding, so decode each leniently as it's used:
+    with proc:
+        try:
+            for line in proc.stdout:
+                found = True
+                yield line.decode('utf-8', errors='replace')
+
+        except GeneratorExit:
+            proc.kill() # the caller has enough
+            raise
+
+        errors = proc.stderr.read().decode('utf-8', errors='replace')
+
+    if not found and proc.returncode not in (0, 1): # 1 means no matches
+        raise SearchFailed(error=errors.strip())
+
+
+def search_python(p, pattern, is_file):
+    pattern = re.sub(r'\[:(\w+):\]', lambda m: fs_search_posix_classes.get(m[1], m[0]), pattern)
+
+    # Find candidate lines in the whole text, then check each line on its own, since a match can
+    # span lines:
+    try:
+        regex = re.compile(pattern)
+        scanner = re.compile(pattern, re.MULTILINE)
+    except re.error as e:
+        raise SearchFailed(error=f"{e} (ripgrep is not installed, so patterns use Python's regex syntax)")
+
+    if is_file:
+        yield from search_file(p, regex, scanner, prefix="", skip_binary=False, max_size=None)
+        return
+
+    # Search several files at once, but only a few ahead of the one being yielded, in order:
+    pool = ThreadPoolExecutor(max_workers=fs_search_workers)
+    pending = deque()
+
+    try:
+        for file in search_files(p):
+            future = pool.submit(search_file, file, regex, scanner, f"{file}:", skip_binary=True, max_size=fs_search_max_filesize)
+            pending.append(future)
+
+            if len(pending) >= 2 * fs_search_workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def search_file(file, regex, scanner, prefix, skip_binary, max_size):
+    try:
+        if max_size is not None and os.stat(file).st_size > max_size:
+            return []
+
+        with open(file, 'rb') as f:
+            # Like rg, skip files with a NUL byte near the start when searching directories:
+            if skip_binary and b'\0' in f.peek(fs_search_binary_sniff)[:fs_search_binary_sniff]:
+                return []
+
+            text = io.TextIOWrapper(f, encoding='utf-8', errors='replace', newline='').read()
+
+    except OSError:
+        return [] # same as rg --no-messages
+
+    lines = []
+    number = 1 # line number at `counted`
+    counted = 0
+    pos = 0
+
+    while pos < len(text) and len(lines) < fs_search_max_per_file:
+        match = scanner.search(text, pos)
+        if not match:
+            break
+
+        start = text.rfind('\n', 0, match.start()) + 1
+        if start == len(text):
+            break # empty match after the last newline, there's no line here
+
+        end = text.find('\n', start) + 1 or len(text)
+        line = text[start:end]
+        pos = end
+
+        if not regex.search(line):
+            continue
+
+        number += text.count('\n', counted, start)
+        counted = start
+
+        line = line if line.endswith('\n') else line + '\n'
+        lines.append(f"{prefix}{number}:{line}")
+
+    return lines
+
+
+def search_files(p):
+    # Files under `p` in name order, skipping hidden ones and symlinks like rg does:
+    try:
+        with os.scandir(p) as it:
+            entries = sorted((entry for entry in it if not entry.name.startswith('.')), key=attrgetter('name'))
+    except OSError:
+        return # same as rg --no-messages
+
+    dirs = []
+
+    for entry in entries:
+        if entry.is_symlink():
+            continue
+        elif entry.is_file():
+            yield entry.path
+        elif entry.is_dir():
+            dirs.append(entry.path)
+
+    for subdir in dirs:
+        yield from search_files(subdir)
 
 
 @tooldef
@@ -423,10 +852,9 @@ def fs_rm(path: str) -> str:
     Returns a success message.
     """
 
-    p = resolve(path)
-    if not p.exists(): raise PathDoesNotExist(path=path)
+    p, stats = resolve_stat(path)
 
-    if p.is_dir():
+    if stat_module.S_ISDIR(stats.st_mode):
         # Require confirmation for directory deletion
         print(f"\nDelete directory '{path}' and all its contents?", file=sys.stderr)
         print("  [Y] Yes | [N] No", file=sys.stderr)
@@ -437,13 +865,12 @@ def fs_rm(path: str) -> str:
             raise CommandDenied(command=f"rm {path}")
 
         # Recursively delete directory
-        import shutil
         shutil.rmtree(p)
         return f"Successfully deleted directory {path} and all its contents"
 
     else:
         # Delete file without confirmation
-        p.unlink()
+        os.unlink(p)
         return f"Successfully deleted file {path}"
 
 
@@ -460,9 +887,9 @@ def fs_mkdir(path: str) -> str:
     """
 
     p = resolve(path)
-    if p.exists(): raise PathAlreadyExists(path=path)
+    if os.path.exists(p): raise PathAlreadyExists(path=path)
 
-    p.mkdir(parents=True, exist_ok=False)
+    os.makedirs(p)
 
     return f"Successfully created directory at {path}"
 
@@ -480,8 +907,12 @@ def fs_replace(path: str, old_string: str, new_string: str, replace_all: bool =
 
     Returns nothing if successful, an error if not.
     """
+    p = resolve(path)
+
     try:
-        with open(path) as f:
+        # Keep line endings as they are, so old_string matches what fs_read shows and the rest of
+        # the file is written back unchanged:
+        with open(p, encoding='utf-8', newline='') as f:
             content = f.read()
     except Exception as e:
         raise FailedReplace(f"Error reading file: {str(e)}")
@@ -495,45 +926,131 @@ def fs_replace(path: str, old_string: str, new_string: str, replace_all: bool =
     if old_string == new_string:
         raise FailedReplace("new_string must be different from old_string")
 
-    count = content.count(old_string)
+    index = content.find(old_string)
+
+    # fs_read shows "\r\n" line endings as they are, but models often write "\n" anyway. Match those
+    # too, and keep the file's line endings in the replacement:
+    if index == -1 and '\r\n' in content and '\r' not in old_string:
+        old_string = old_string.replace('\n', '\r\n')
+        new_string = new_string.replace('\n', '\r\n')
+        index = content.find(old_string)
 
-    if count == 0:
+    if index == -1:
         raise FailedReplace("old_string not found in content")
 
     if replace_all:
         updated_content = content.replace(old_string, new_string)
     else:
-        updated_content = content.replace(old_string, new_string, 1)
+        updated_content = content[:index] + new_string + content[index + len(old_string):]
 
     try:
-        with open(path, 'w') as f:
-            f.write(updated_content)
+        write_atomic(p, updated_content.encode('utf-8'))
     except Exception as e:
         raise FailedReplace(f"Error writing file: {str(e)}")
 
 
-def resolve(path_str):
-    path = Path(path_str)
-    root = Path(WD).resolve()
+def write_atomic(path, data):
+    # Write a temporary file next to the target and rename it over the target. Renaming is atomic,
+    # so a failure halfway leaves the original intact instead of truncated. `path` must be resolved
+    # already, so a symlink's target is replaced and not the link:
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f".{os.path.basename(path)}.")
 
-    if path.is_absolute():
-        path = path.resolve()
-    else:
-        path = (root / path).resolve()
+    try:
+        try:
+            write_all(fd, data)
+        finally:
+            os.close(fd)
+
+        # mkstemp creates 0600. Keep the mode of the file being replaced, or give a new one the usual:
+        try:
+            mode = stat_module.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~umask
+
+        os.chmod(tmp, mode)
+
+        os.replace(tmp, path)
+        fs_read_offsets.pop(path, None)
+
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_all(fd, data):
+    data = memoryview(data)
 
-    if not path.is_relative_to(root):
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def resolve(path_str):
+    root = resolve_root(WD)
+    path = os.path.realpath(os.path.join(root, path_str)) # joining an absolute path just yields that path
+
+    if not is_inside(path, root):
         raise PathOutsideWorkDir(path=path_str, wd=WD)
 
     return path
 
+
+def resolve_stat(path_str, require=None):
+    # Resolve, and check existence and type (if `require` is 'file' or 'dir'):
+    path = resolve(path_str)
+
+    try:
+        stats = os.stat(path)
+    except FileNotFoundError:
+        raise PathDoesNotExist(path=path_str)
+
+    if require == 'file' and not stat_module.S_ISREG(stats.st_mode):
+        raise PathIsNotFile(path=path_str)
+
+    if require == 'dir' and not stat_module.S_ISDIR(stats.st_mode):
+        raise PathIsNotDirectory(path=path_str)
+
+    return path, stats
+
+
+def stat_type(mode):
+    return (
+        'l' if stat_module.S_ISLNK(mode) else
+        'd' if stat_module.S_ISDIR(mode) else
+        'f' if stat_module.S_ISREG(mode) else
+        '?'
+    )
+
+
+@lru_cache(maxsize=8)
+def resolve_root(wd):
+    # The working directory doesn't change during a session
+    return os.path.realpath(wd)
+
+
+def is_inside(path, root):
+    # Both paths must be resolved already, so comparing strings is enough:
+    return path == root or path.startswith(os.path.join(root, ''))
+
 # --------------------------------------------------------------------------------------------------
 # Kagi Search (adapted from kagimcp)
 
-kagi_client = kagi.KagiClient(os.getenv('KAGI_API_KEY'))
+kagi_client = None # created on first use, see get_kagi_client()
 
-web_fetch_types = ['text/plain', 'text/html', 'application/json', 'application/xml', 'text/xml']
+web_fetch_types = frozenset(['text/plain', 'text/html', 'application/json', 'application/xml', 'text/xml'])
 web_fetch_max_size = 10_000_000
 web_fetch_max_text_length = 100_000
+web_fetch_timeout = (5, 30) # seconds to connect, seconds between bytes
+
+web_session = None # created on first use, see get_web_session()
+
+web_pool = ThreadPoolExecutor(max_workers=8)
+web_clients_lock = threading.Lock() # pool threads can ask for the client and session at the same time
+
+web_cache_path = Path.home() / '.cache' / 'ai' / 'web.sqlite'
+web_cache_db = None
+web_cache_lock = threading.Lock()
+web_cache_memory = {} # key -> (expires, value), most recently used last
+web_cache_memory_size = 256
 
 @tooldef
 def web_search(query: str) -> str:
@@ -549,12 +1066,39 @@ def web_search(query: str) -> str:
 
     if not query: raise MissingOrEmpty(name="query")
 
-    result = kagi_client.search(query)
+    result = kagi_search(query)
     answer = format_results(query, result)
 
     return answer
 
 
+@tooldef
+def web_searches(queries: list[str]) -> str:
+    """
+    Fetch web results for several queries at once.
+
+    Arguments:
+        queries: the search queries
+
+    Prefer this over several calls to web_search, the queries are searched in parallel.
+    Returns numbered results for each query, headed by the query, in the given order.
+    """
+    if not queries: raise MissingOrEmpty(name="queries")
+
+    answers = web_pool.map(search_or_error, queries)
+
+    return "\n\n".join(f"# {query}\n{answer}" for query, answer in zip(queries, answers))
+
+
+def search_or_error(query):
+    # One failed query shouldn't fail the batch
+    try:
+        if not query: raise MissingOrEmpty(name="query")
+        return format_results(query, kagi_search(query))
+    except Exception as e:
+        return f"Error: {str(e) or repr(e)}"
+
+
 @tooldef
 def web_fetch(url: str) -> str:
     """
@@ -566,25 +1110,38 @@ def web_fetch(url: str) -> str:
     Returns a plain-text representation of the content, if possible.
     """
     try:
-       with requests.get(url, stream=True) as r:
-            content_type = r.headers.get('content-type', '').split(';')[0].strip()
+       with get_web_session().get(url, stream=True, timeout=web_fetch_timeout) as r:
+            content_type = r.headers.get('content-type', '').partition(';')[0].strip().lower()
 
             if content_type not in web_fetch_types:
                 raise UnsupportedMimeType(type=content_type)
 
+            # Decode as chunks arrive. Plain text can then be cut off as soon as it's over the text
+            # limit, but HTML shrinks once converted below, so only its raw size is capped:
+            decoder = codecs.getincrementaldecoder(r.encoding or 'utf-8')(errors="replace")
+            max_length = web_fetch_max_text_length if content_type != 'text/html' else None
+
             total = 0
-            data = bytearray()
+            length = 0
+            parts = []
 
             for chunk in r.iter_content(chunk_size=8192):
                 total += len(chunk)
                 if total > web_fetch_max_size:
                     raise ResponseTooLong(max=web_fetch_max_text_length)
 
-                data.extend(chunk)
+                parts.append(decoder.decode(chunk))
+
+                length += len(parts[-1])
+                if max_length and length > max_length:
+                    raise ResponseTooLong(max=web_fetch_max_text_length)
 
-            text = data.decode(r.encoding or 'utf-8', errors="replace")
+            parts.append(decoder.decode(b'', final=True))
+            text = "".join(parts)
 
             if content_type == 'text/html':
+                import readabilipy, markdownify # slow to import, and only needed for HTML
+
                 readable = readabilipy.simple_json_from_html_string(text, use_readability=True)
                 text = markdownify.markdownify(readable['content'] or "", heading_style=markdownify.ATX)
             
@@ -610,40 +1167,223 @@ def web_fetch_summary(url: str) -> str:
     """
     if not url: raise InvalidUrl(url=url)
 
-    answer = kagi_client.summarize(
-        url             = url,
-        engine          = "cecil",
-        summary_type    = "summary",
-        target_language = "EN",
-    )["data"]["output"]
+    answer = kagi_summarize(url)
 
     return answer
 
 
-def format_results(query: str, response) -> str:
-    template = textwrap.dedent("""
-        {number}: {title}
-        {url}
-        Published Date: {published}
-        {snippet}
-    """).strip()
+@tooldef
+def web_fetch_summaries(urls: list[str]) -> str:
+    """
+    Fetch web summarized content from several URLs at once.
+
+    Arguments:
+        urls: the URLs to fetch and summarize
+
+    Works with any document type (text webpage, video, audio, etc.)
+    Prefer this over several calls to web_fetch_summary, the URLs are summarized in parallel.
+    Returns the summary of each URL, headed by the URL, in the given order.
+    """
+    if not urls: raise MissingOrEmpty(name="urls")
+
+    summaries = web_pool.map(summarize_or_error, urls)
+
+    return "\n\n".join(f"{url}\n{summary}" for url, summary in zip(urls, summaries))
 
+
+def summarize_or_error(url):
+    # One failed URL shouldn't fail the batch
+    try:
+        if not url: raise InvalidUrl(url=url)
+        return kagi_summarize(url)
+    except Exception as e:
+        return f"Error: {str(e) or repr(e)}"
+
+
+def format_results(query: str, response) -> str:
     # t == 0 is search result, t == 1 is related searches
-    results = [result for result in response["data"] if result["t"] == 0]
-
-    # published date is not always present
-    results_formatted = [
-        template.format(
-            number    = number,
-            title     = result["title"],
-            url       = result["url"],
-            published = result.get("published", "Not Available"),
-            snippet   = result["snippet"],
-        )
-        for number, result in enumerate(results)
-    ]
+    results = (result for result in response["data"] if result["t"] == 0)
+
+    # Numbered from 1, the way results are usually referred to:
+    return "\n\n".join(format_result(number, result) for number, result in enumerate(results, 1))
+
+
+def format_result(number, result):
+    # Published date is not always present:
+    return (
+        f"{number}: {result['title']}\n"
+        f"{result['url']}\n"
+        f"Published Date: {result.get('published', 'Not Available')}\n"
+        f"{result['snippet']}"
+    )
+
+
+def web_cached(ttl):
+    # Keep results on disk for `ttl` seconds, keyed by function name and argument:
+    def decorator(func):
+        @wraps(func)
+        def wrapper(arg):
+            key = f"{func.__name__}:{arg}"
+            now = time.time()
+
+            with web_cache_lock:
+                # Recent results are kept in memory too:
+                hit = web_cache_memory.pop(key, None)
+
+                if hit and hit[0] > now:
+                    web_cache_memory[key] = hit
+                    return hit[1]
+
+                # The disk cache is only a shortcut, if it can't be used the call goes through:
+                try:
+                    db = web_cache()
+                    row = db.execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+                except (sqlite3.Error, OSError):
+                    db, row = None, None
+
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                web_cache_remember(key, row[1], value)
+                return value
+
+            value = func(arg)
+            expires = time.time() + ttl
+
+            if db is not None:
+                try:
+                    with web_cache_lock, db:
+                        db.execute(
+                            "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                            (key, json.dumps(value), expires)
+                        )
+                except (sqlite3.Error, OSError):
+                    pass # the result is good, it just won't be on disk next time
+
+            web_cache_remember(key, expires, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def web_cache_remember(key, expires, value):
+    with web_cache_lock:
+        web_cache_memory[key] = (expires, value)
+
+        if len(web_cache_memory) > web_cache_memory_size:
+            del web_cache_memory[next(iter(web_cache_memory))] # least recently used
+
+
+def web_cache():
+    global web_cache_db
 
-    return "\n\n".join(results_formatted)
+    if web_cache_db is None:
+        web_cache_path.parent.mkdir(parents=True, exist_ok=True)
+
+        db = sqlite3.connect(web_cache_path, check_same_thread=False)
+
+        try:
+            with db:
+                db.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, expires REAL)")
+                db.execute("DELETE FROM cache WHERE expires < ?", (time.time(),)) # or it grows forever
+        except sqlite3.Error:
+            db.close()
+            raise
+
+        web_cache_db = db
+
+    return web_cache_db
+
+
+def get_kagi_client():
+    global kagi_client
+
+    if kagi_client is not None:
+        return kagi_client
+
+    with web_clients_lock:
+        if kagi_client is None:
+            api_key = os.getenv('KAGI_API_KEY')
+            if not api_key: raise MissingApiKey(name='KAGI_API_KEY') # before importing or connecting anything
+
+            import kagiapi
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            client = kagiapi.KagiClient(api_key)
+
+            # Keep connections to Kagi alive across calls, and retry transient failures:
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=Retry(total=2, backoff_factor=0.3))
+            client.session.mount('https://', adapter)
+
+            kagi_client = client # only once it's ready, other threads may be looking
+
+    return kagi_client
+
+
+def get_web_session():
+    global web_session
+
+    if web_session is not None:
+        return web_session
+
+    with web_clients_lock:
+        if web_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from urllib3.util.retry import Retry
+
+            session = requests.Session()
+
+            # Keep connections alive across fetches:
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.2))
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            web_session = session # only once it's ready, other threads may be looking
+
+    return web_session
+
+
+@web_cached(ttl=60 * 60)
+def kagi_search(query):
+    return get_kagi_client().search(query)
+
+
+@web_cached(ttl=24 * 60 * 60)
+def kagi_summarize(url):
+    # Summaries of the same URL are stable, they can live longer than search results
+    response = get_kagi_client().summarize(
+        url             = url,
+        engine          = "cecil",
+        summary_type    = "summary",
+        target_language = "EN",
+    )
+
+    return response["data"]["output"]
+
+
+# --------------------------------------------------------------------------------------------------
+# Tools
+
+act_tools = (
+    web_search,
+    web_searches,
+    web_fetch,
+    web_fetch_summary,
+    web_fetch_summaries,
+    fs_stat,
+    fs_read,
+    fs_write,
+    fs_list,
+    fs_search,
+    fs_replace,
+    fs_mkdir,
+    fs_rm,
+    fs_pwd,
+    shell,
+)
 
 
 # --------------------------------------------------------------------------------------------------
@@ -1,3 +1,4 @@
+import io
 import pytest
 from unittest.mock import Mock, MagicMock
 
@@ -34,14 +35,26 @@ def sample_dir(tmp_wd):
 
 @pytest.fixture
 def mock_subprocess(monkeypatch):
-    """Mock subprocess.run for shell command tests."""
+    """Mock subprocess.Popen for shell command tests. Set `return_value` to the command's result."""
     mock = Mock()
     mock.return_value = Mock(
         returncode=0,
         stdout="mock output",
         stderr=""
     )
-    monkeypatch.setattr('subprocess.run', mock)
+
+    def popen(args, **kwargs):
+        result = mock.return_value
+
+        process = MagicMock()
+        process.__enter__.return_value = process
+        process.stdout = io.BytesIO(result.stdout.encode())
+        process.wait.return_value = result.returncode
+
+        return process
+
+    mock.side_effect = popen
+    monkeypatch.setattr('subprocess.Popen', mock)
     return mock
 
 
@@ -72,6 +85,22 @@ def mock_kagi(monkeypatch):
     return mock_client
 
 
+@pytest.fixture
+def mock_http(monkeypatch):
+    """Mock HTTP session for web_fetch tests. Set `response.chunks` to the body."""
+    response = MagicMock()
+    response.headers = {"content-type": "text/plain; charset=utf-8"}
+    response.encoding = "utf-8"
+    response.chunks = [b"Test content"]
+    response.iter_content.side_effect = lambda chunk_size: iter(response.chunks)
+
+    mock_session = MagicMock()
+    mock_session.get.return_value.__enter__.return_value = response
+
+    monkeypatch.setattr('ai.main.web_session', mock_session)
+    return mock_session
+
+
 @pytest.fixture
 def mock_lms(monkeypatch):
     """Mock LMStudio for integration tests."""
@@ -87,9 +116,18 @@ def mock_lms(monkeypatch):
     }
 
 
+@pytest.fixture(autouse=True)
+def web_cache(tmp_path, monkeypatch):
+    """Isolated, empty web cache for each test."""
+    monkeypatch.setattr('ai.main.web_cache_path', tmp_path / "web.sqlite")
+    monkeypatch.setattr('ai.main.web_cache_db', None)
+    monkeypatch.setattr('ai.main.web_cache_memory', {})
+    return tmp_path / "web.sqlite"
+
+
 @pytest.fixture(autouse=True)
 def reset_shell_permissions():
-    """Reset shell allowed/forbidden lists between tests."""
+    """Reset shell allowed/forbidden sets between tests."""
     from ai import main
     main.shell_allowed.clear()
     main.shell_forbidden.clear()
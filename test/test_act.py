@@ -0,0 +1,136 @@
+import pytest
+from types import SimpleNamespace
+from ai import main
+
+
+def test_act_runs_tool_calls_in_order(mock_lms):
+    """act() leaves tool calls sequential, so a round's writes and reads can't race."""
+    model = mock_lms['model']
+
+    main.act(model, "prompt", {})
+
+    model.act.assert_called_once()
+    assert 'max_parallel_tool_calls' not in model.act.call_args.kwargs
+
+
+def test_act_passes_config_and_draft_tuner(mock_lms):
+    """act() hands the config and the draft tuner's update to model.act()."""
+    model = mock_lms['model']
+    config = {'draftModel': 'draft'}
+    tuner = main.DraftTuner(config)
+
+    main.act(model, "prompt", config, tuner)
+
+    kwargs = model.act.call_args.kwargs
+    assert kwargs['config'] is config
+    assert kwargs['on_prediction_completed'] == tuner.update
+
+
+def test_act_without_draft_tuner(mock_lms):
+    """act() passes no completion callback without a draft tuner."""
+    model = mock_lms['model']
+
+    main.act(model, "prompt", {})
+
+    assert model.act.call_args.kwargs['on_prediction_completed'] is None
+
+
+def prediction(drafted, accepted):
+    return SimpleNamespace(stats=SimpleNamespace(
+        total_draft_tokens_count=drafted,
+        accepted_draft_tokens_count=accepted
+    ))
+
+
+def test_draft_tuner_follows_acceptance_rate():
+    """DraftTuner drafts more tokens as more are accepted, and fewer as fewer are."""
+    config = {}
+    tuner = main.DraftTuner(config)
+
+    tuner.update(prediction(10, 9))
+    assert tuner.rate == pytest.approx(0.7)
+    assert config['speculativeDecodingNumDraftTokensExact'] == 2
+
+    tuner.update(prediction(10, 10))
+    assert config['speculativeDecodingNumDraftTokensExact'] == 6
+
+    tuner.update(prediction(10, 0))
+    assert config['speculativeDecodingNumDraftTokensExact'] == 1
+
+
+def test_draft_tuner_clamps_tokens():
+    """DraftTuner drafts between 1 and max_tokens tokens, even at the extremes."""
+    config = {}
+    tuner = main.DraftTuner(config, rate=1, smoothing=1, max_tokens=4)
+
+    tuner.update(prediction(10, 10))
+    assert config['speculativeDecodingNumDraftTokensExact'] == 4
+
+    tuner = main.DraftTuner(config, rate=0, smoothing=1)
+
+    tuner.update(prediction(10, 0))
+    assert config['speculativeDecodingNumDraftTokensExact'] == 1
+
+
+def test_draft_tuner_ignores_rounds_without_drafts():
+    """DraftTuner leaves the config alone when nothing was drafted or acceptance is unknown."""
+    config = {}
+    tuner = main.DraftTuner(config)
+
+    tuner.update(prediction(0, 0))
+    tuner.update(prediction(None, None))
+    tuner.update(prediction(10, None))
+
+    assert config == {}
+    assert tuner.rate == 0.5
+
+
+def run_main(monkeypatch, *args):
+    calls = {}
+    monkeypatch.setattr('sys.argv', ['ai', *args, '--no-sandbox', 'prompt'])
+    monkeypatch.setattr('sys.stdin.isatty', lambda: True)
+    monkeypatch.setattr('ai.main.act', lambda model, prompt, config, tuner: calls.update(config=config, tuner=tuner))
+    monkeypatch.setattr('ai.main.respond', lambda model, prompt, config: calls.update(config=config))
+
+    main.main()
+    return calls
+
+
+def test_main_draft_tokens(mock_lms, monkeypatch):
+    """--draft with --draft-tokens sets a fixed number of drafted tokens."""
+    calls = run_main(monkeypatch, 'act', '--draft', 'small', '--draft-tokens', '3')
+
+    assert calls['config'] == {'draftModel': 'small', 'speculativeDecodingNumDraftTokensExact': 3}
+    assert calls['tuner'] is None
+
+
+def test_main_draft_tuned(mock_lms, monkeypatch):
+    """--draft alone tunes the number of drafted tokens when acting."""
+    calls = run_main(monkeypatch, 'act', '--draft', 'small')
+
+    assert calls['config'] == {'draftModel': 'small'}
+    assert calls['tuner'].config is calls['config']
+
+
+def test_main_draft_ask(mock_lms, monkeypatch):
+    """--draft works when asking, leaving the number of drafted tokens to LM Studio."""
+    calls = run_main(monkeypatch, 'ask', '--draft', 'small')
+
+    assert calls['config'] == {'draftModel': 'small'}
+
+
+def test_main_draft_tokens_requires_draft(mock_lms, monkeypatch, capsys):
+    """--draft-tokens without --draft is a usage error."""
+    with pytest.raises(SystemExit):
+        run_main(monkeypatch, 'act', '--draft-tokens', '3')
+
+    assert "--draft-tokens requires --draft" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("tokens", ['0', '-2'])
+def test_main_draft_tokens_at_least_one(mock_lms, monkeypatch, capsys, tokens):
+    """--draft-tokens below 1 is a usage error, not a request for the tuner."""
+    with pytest.raises(SystemExit):
+        run_main(monkeypatch, 'act', '--draft', 'small', '--draft-tokens', tokens)
+
+    assert "--draft-tokens must be at least 1" in capsys.readouterr().err
@@ -86,3 +86,45 @@ def test_fs_list_outside_wd(tmp_path):
 
     assert result.startswith("Error:")
     assert "outside working directory" in result
+
+
+def test_fs_list_symlinks(sample_dir):
+    """fs_list marks symlinks with 'l' and skips broken ones."""
+    (sample_dir / "link.txt").symlink_to(sample_dir / "file1.txt")
+    (sample_dir / "broken.txt").symlink_to(sample_dir / "missing.txt")
+
+    result = main.fs_list(str(sample_dir))
+
+    entries = {line.split()[2]: line.split()[1] for line in result.split('\n')}
+    assert entries['link.txt'] == 'l'
+    assert 'broken.txt' not in entries
+
+
+def test_fs_list_limit(sample_dir):
+    """fs_list lists the first entries by name up to the limit, and says how many are left."""
+    result = main.fs_list(str(sample_dir), limit=2)
+
+    lines = result.split('\n')
+    assert len(lines) == 3
+    assert lines[0].split()[2] == 'file1.txt'
+    assert lines[1].split()[2] == 'file2.txt'
+    assert lines[2] == "(truncated, 1 more entries)"
+
+
+@pytest.mark.parametrize("limit", [0, -1])
+def test_fs_list_limit_too_small(sample_dir, limit):
+    """fs_list rejects a limit below 1 instead of listing nothing."""
+    result = main.fs_list(str(sample_dir), limit=limit)
+
+    assert result.startswith("Error:")
+    assert "limit must be at least 1" in result
+
+
+def test_fs_list_truncated_unreadable_entries(tmp_wd):
+    """fs_list says there are more entries even when none of the listed ones could be read."""
+    (tmp_wd / "a_broken").symlink_to(tmp_wd / "missing")
+    (tmp_wd / "b.txt").write_text("b")
+
+    result = main.fs_list(str(tmp_wd), limit=1)
+
+    assert result == "(truncated, 1 more entries)"
@@ -1,3 +1,4 @@
+import os
 import pytest
 from pathlib import Path
 from ai import main
@@ -81,3 +82,125 @@ def test_fs_read_relative(tmp_wd, sample_file):
     result2 = main.fs_read(Path(sample_file).name)
 
     assert result1 == result2
+
+
+def test_fs_read_negative_start(sample_file):
+    """fs_read handles negative start index."""
+    result = main.fs_read(str(sample_file), start=-2)
+
+    lines = sample_file.read_text().splitlines(keepends=True)
+    expected = "".join(lines[-2:])
+    assert result == expected
+
+
+def test_fs_read_negative_start_and_end(sample_file):
+    """fs_read handles negative start and end indexes."""
+    result = main.fs_read(str(sample_file), start=-3, end=-2)
+
+    lines = sample_file.read_text().splitlines(keepends=True)
+    expected = "".join(lines[-3:-1])
+    assert result == expected
+
+
+def test_fs_read_after_change(sample_file):
+    """fs_read sees changes made to a file after a previous read."""
+    main.fs_read(str(sample_file), start=1, end=1)
+    sample_file.write_text("first\nsecond line, now longer\n")
+
+    result = main.fs_read(str(sample_file), start=1, end=1)
+
+    assert result == "second line, now longer\n"
+
+
+def test_fs_read_after_same_size_replace(tmp_wd):
+    """fs_read sees a same-size edit made right after a previous read."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("a\nbb\ncc\n")
+
+    main.fs_read(str(test_file), start=1, end=-1)
+    main.fs_replace(str(test_file), "a\nbb", "aa\nb")
+
+    result = main.fs_read(str(test_file), start=1, end=-1)
+
+    assert result == "b\ncc\n"
+
+
+def test_fs_read_after_same_size_write(tmp_wd):
+    """fs_read sees a same-size overwrite made right after a previous read."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("a\nbb\ncc\n")
+
+    main.fs_read(str(test_file), start=1, end=-1)
+    main.fs_write(str(test_file), "aa\nb\ncc\n")
+
+    result = main.fs_read(str(test_file), start=1, end=-1)
+
+    assert result == "b\ncc\n"
+
+
+def test_fs_read_offsets_bounded(tmp_wd, monkeypatch):
+    """fs_read keeps line offsets for a bounded number of files."""
+    monkeypatch.setattr('ai.main.fs_read_offsets', {})
+    monkeypatch.setattr('ai.main.fs_read_offsets_size', 2)
+
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (tmp_wd / name).write_text("1\n2\n3\n")
+        assert main.fs_read(str(tmp_wd / name), start=1, end=-1) == "2\n3\n"
+
+    assert [os.path.basename(p) for p in main.fs_read_offsets] == ["b.txt", "c.txt"]
+
+
+def test_fs_read_sibling_of_wd(tmp_wd):
+    """fs_read rejects paths in a sibling directory that shares the working directory's prefix."""
+    sibling = tmp_wd.parent / (tmp_wd.name + "-sibling")
+    sibling.mkdir()
+    (sibling / "file.txt").write_text("content")
+
+    result = main.fs_read(str(sibling / "file.txt"))
+
+    assert result.startswith("Error:")
+    assert "outside working directory" in result
+
+
+def test_fs_read_no_trailing_newline(tmp_wd):
+    """fs_read returns the last line even without a trailing newline."""
+    test_file = tmp_wd / "partial.txt"
+    test_file.write_text("line 1\nline 2")
+
+    assert main.fs_read(str(test_file), start=1) == "line 2"
+    assert main.fs_read(str(test_file), start=-1) == "line 2"
+
+
+def test_fs_read_empty_file(tmp_wd):
+    """fs_read handles empty files."""
+    test_file = tmp_wd / "empty.txt"
+    test_file.write_text("")
+
+    assert main.fs_read(str(test_file)) == ""
+    assert main.fs_read(str(test_file), start=1, end=3) == ""
+
+
+def test_fs_read_tail_longer_than_file(sample_file):
+    """fs_read returns the whole file when asked for more trailing lines than it has."""
+    result = main.fs_read(str(sample_file), start=-100)
+
+    assert result == sample_file.read_text()
+
+
+def test_fs_read_fifo(tmp_wd):
+    """fs_read returns error for a named pipe, without waiting for a writer."""
+    os.mkfifo(tmp_wd / "pipe")
+
+    result = main.fs_read(str(tmp_wd / "pipe"))
+
+    assert result.startswith("Error:")
+    assert "not a file" in result
+
+
+def test_fs_read_line_endings(tmp_wd):
+    """fs_read splits lines on "\\n" only and returns line endings as they are, like rg."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_bytes(b"one\r\ntwo\rstill two\nthree\n")
+
+    assert main.fs_read(str(test_file), start=1, end=1) == "two\rstill two\n"
+    assert main.fs_read(str(test_file), start=0, end=0) == "one\r\n"
@@ -104,3 +104,86 @@ def test_fs_replace_nonexistent_file(tmp_wd):
 
     assert result.startswith("Error:")
     assert "Error reading file" in result
+
+
+def test_fs_replace_preserves_mode(tmp_wd):
+    """fs_replace keeps the file's permissions and leaves no temporary file behind."""
+    test_file = tmp_wd / "script.sh"
+    test_file.write_text("echo hello\n")
+    test_file.chmod(0o750)
+
+    main.fs_replace(str(test_file), "hello", "goodbye")
+
+    assert test_file.read_text() == "echo goodbye\n"
+    assert test_file.stat().st_mode & 0o777 == 0o750
+    assert [p.name for p in tmp_wd.iterdir()] == ["script.sh"]
+
+
+def test_fs_replace_through_symlink(tmp_wd):
+    """fs_replace edits the target of a symlink, keeping the link."""
+    target = tmp_wd / "target.txt"
+    target.write_text("hello world\n")
+    link = tmp_wd / "link.txt"
+    link.symlink_to(target)
+
+    main.fs_replace(str(link), "hello", "goodbye")
+
+    assert link.is_symlink()
+    assert target.read_text() == "goodbye world\n"
+
+
+def test_fs_replace_outside_wd(tmp_wd, tmp_path_factory):
+    """fs_replace returns error for paths outside working directory."""
+    outside = tmp_path_factory.mktemp("outside") / "outside.txt"
+    outside.write_text("hello world\n")
+
+    result = main.fs_replace(str(outside), "hello", "goodbye")
+
+    assert result.startswith("Error:")
+    assert "outside working directory" in result
+    assert outside.read_text() == "hello world\n"
+
+
+def test_fs_replace_relative(tmp_wd):
+    """fs_replace resolves relative paths against the working directory."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("hello world\n")
+
+    main.fs_replace("test.txt", "hello", "goodbye")
+
+    assert test_file.read_text() == "goodbye world\n"
+
+
+def test_fs_replace_crlf(tmp_wd):
+    """fs_replace matches text as fs_read shows it, and keeps the file's line endings."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_bytes(b"one\r\ntwo\r\nthree\r\n")
+
+    shown = main.fs_read(str(test_file), start=1, end=2)
+    assert shown == "two\r\nthree\r\n"
+
+    main.fs_replace(str(test_file), shown, "2\r\n3\r\n")
+
+    assert test_file.read_bytes() == b"one\r\n2\r\n3\r\n"
+
+
+def test_fs_replace_lone_cr(tmp_wd):
+    """fs_replace leaves a lone carriage return alone, like fs_read."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_bytes(b"progress\r100%\n")
+
+    assert main.fs_read(str(test_file), start=0, end=1) == "progress\r100%\n"
+
+    main.fs_replace(str(test_file), "progress\r", "done\r")
+
+    assert test_file.read_bytes() == b"done\r100%\n"
+
+
+def test_fs_replace_lf_in_crlf_file(tmp_wd):
+    """fs_replace matches "\\n" in old_string against "\\r\\n" in the file, and writes "\\r\\n" back."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_bytes(b"one\r\ntwo\r\nthree\r\n")
+
+    main.fs_replace(str(test_file), "one\ntwo\n", "1\n2\n")
+
+    assert test_file.read_bytes() == b"1\r\n2\r\nthree\r\n"
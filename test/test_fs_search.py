@@ -81,3 +81,126 @@ def test_fs_search_outside_wd(tmp_path):
 
     assert result.startswith("Error:")
     assert "outside working directory" in result
+
+
+def test_fs_search_truncated(tmp_wd, monkeypatch):
+    """fs_search stops at the match limit and says so."""
+    monkeypatch.setattr('ai.main.fs_search_max_lines', 2)
+    test_file = tmp_wd / "many.txt"
+    test_file.write_text("match 1\nmatch 2\nmatch 3\n")
+
+    result = main.fs_search(str(test_file), "match")
+
+    assert "match 1" in result
+    assert "match 2" in result
+    assert "match 3" not in result
+    assert "truncated" in result
+
+
+def test_fs_search_match_within_lines(tmp_wd):
+    """fs_search only reports patterns matched within a single line."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("foo\nbar\nfoo bar\n")
+
+    result = main.fs_search(str(test_file), r"foo\sbar")
+
+    assert result == "3:foo bar\n"
+
+
+def test_fs_search_skips_hidden(tmp_wd, monkeypatch):
+    """fs_search skips hidden files and directories."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    (tmp_wd / ".git").mkdir()
+    (tmp_wd / ".git" / "config").write_text("hello\n")
+    (tmp_wd / ".hidden.txt").write_text("hello\n")
+    (tmp_wd / "sub").mkdir()
+    (tmp_wd / "sub" / "visible.txt").write_text("hello\n")
+
+    result = main.fs_search(str(tmp_wd), "hello")
+
+    assert result == f"{tmp_wd / 'sub' / 'visible.txt'}:1:hello\n"
+
+
+def test_fs_search_skips_symlinks(tmp_wd, monkeypatch):
+    """fs_search doesn't follow symlinks when searching directories."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    (tmp_wd / "file.txt").write_text("hello\n")
+    (tmp_wd / "link.txt").symlink_to(tmp_wd / "file.txt")
+
+    result = main.fs_search(str(tmp_wd), "hello")
+
+    assert result == f"{tmp_wd / 'file.txt'}:1:hello\n"
+
+
+def test_fs_search_skips_binary(tmp_wd, monkeypatch):
+    """fs_search skips binary files when searching directories, but not when asked for one."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    (tmp_wd / "text.txt").write_text("hello\n")
+    (tmp_wd / "data.bin").write_bytes(b"\0\1\2hello\n")
+
+    result = main.fs_search(str(tmp_wd), "hello")
+    assert result == f"{tmp_wd / 'text.txt'}:1:hello\n"
+
+    result = main.fs_search(str(tmp_wd / "data.bin"), "hello")
+    assert result == "1:\0\1\2hello\n"
+
+
+def test_fs_search_large_file_by_name(tmp_wd, monkeypatch):
+    """fs_search skips large files in directories, but searches one asked for by name."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    monkeypatch.setattr('ai.main.fs_search_max_filesize', 10)
+    test_file = tmp_wd / "big.txt"
+    test_file.write_text("x" * 100 + "\nhello\n")
+
+    assert main.fs_search(str(tmp_wd), "hello") == ""
+    assert main.fs_search(str(test_file), "hello") == "2:hello\n"
+
+
+def test_fs_search_single_file_uses_rg(tmp_wd, monkeypatch, mock_subprocess):
+    """fs_search uses rg for a single file when it's installed, without the size limit."""
+    monkeypatch.setattr('shutil.which', lambda name: "/usr/bin/rg")
+    mock_subprocess.return_value.stdout = "1:123\n"
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("123\n")
+
+    result = main.fs_search(str(test_file), "[[:digit:]]+")
+
+    args = mock_subprocess.call_args[0][0]
+    assert args[0] == "rg"
+    assert "--max-filesize" not in args
+    assert args[-2:] == ["[[:digit:]]+", str(test_file)]
+    assert result == "1:123\n"
+
+
+def test_fs_search_posix_class_without_rg(tmp_wd, monkeypatch):
+    """fs_search understands POSIX classes like rg does when rg is not installed."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("abc\nabc123\n")
+
+    result = main.fs_search(str(test_file), "[[:alpha:]][[:digit:]]+")
+
+    assert result == "2:abc123\n"
+
+
+def test_fs_search_unsupported_pattern_without_rg(tmp_wd, monkeypatch):
+    """fs_search reports patterns Python can't compile instead of returning no matches."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("αβγ\n")
+
+    result = main.fs_search(str(test_file), r"\p{Greek}")
+
+    assert result.startswith("Error:")
+    assert "bad escape" in result
+    assert "ripgrep is not installed" in result
+
+
+def test_fs_search_line_endings_without_rg(tmp_wd, monkeypatch):
+    """fs_search splits lines on "\\n" only when rg is not installed, numbering them like rg and fs_read."""
+    monkeypatch.setattr('shutil.which', lambda name: None)
+    test_file = tmp_wd / "test.txt"
+    test_file.write_bytes("one\r\ntwo\rstill two\nthré\n".encode('utf-8'))
+
+    assert main.fs_search(str(test_file), "still") == "2:two\rstill two\n"
+    assert main.fs_search(str(test_file), "thré") == "3:thré\n"
@@ -56,3 +56,28 @@ def test_fs_stat_outside_wd(tmp_path):
 
     assert result.startswith("Error:")
     assert "outside working directory" in result
+
+
+def test_fs_stat_symlink(sample_file):
+    """fs_stat describes symlinks themselves."""
+    link = sample_file.parent / "link.txt"
+    link.symlink_to(sample_file)
+
+    result = main.fs_stat(str(link))
+
+    lines = result.split('\n')
+    assert lines[0] == f'size: {link.lstat().st_size}'
+    assert lines[4] == 'type: l'
+
+
+def test_fs_stat_symlink_outside_wd(tmp_wd, tmp_path_factory):
+    """fs_stat returns error for symlinks pointing outside working directory."""
+    outside = tmp_path_factory.mktemp("outside") / "outside.txt"
+    outside.write_text("content")
+    link = tmp_wd / "link.txt"
+    link.symlink_to(outside)
+
+    result = main.fs_stat(str(link))
+
+    assert result.startswith("Error:")
+    assert "outside working directory" in result
@@ -72,3 +72,79 @@ def test_fs_write_outside_wd(tmp_path):
     assert result.startswith("Error:")
     assert "outside working directory" in result
     assert not outside_file.exists()
+
+
+def test_fs_write_read_mode(tmp_wd):
+    """fs_write supports modes other than plain write and append."""
+    target = tmp_wd / "plus.txt"
+    target.write_text("first\n")
+
+    result = main.fs_write(str(target), "second\n", mode='a+')
+
+    assert target.read_text() == "first\nsecond\n"
+    assert "mode: a+" in result
+
+
+def test_fs_write_unicode(tmp_wd):
+    """fs_write counts characters, not bytes, and writes UTF-8."""
+    target = tmp_wd / "unicode.txt"
+
+    result = main.fs_write(str(target), "héllo ✓")
+
+    assert target.read_text(encoding='utf-8') == "héllo ✓"
+    assert "Successfully wrote 7 characters" in result
+
+
+def test_fs_write_overwrite_preserves_mode(tmp_wd):
+    """fs_write keeps the permissions of overwritten files and leaves no temporary file behind."""
+    test_file = tmp_wd / "script.sh"
+    test_file.write_text("echo old\n")
+    test_file.chmod(0o750)
+
+    main.fs_write(str(test_file), "echo new\n")
+
+    assert test_file.read_text() == "echo new\n"
+    assert test_file.stat().st_mode & 0o777 == 0o750
+    assert [p.name for p in tmp_wd.iterdir()] == ["script.sh"]
+
+
+def test_fs_write_new_file_mode(tmp_wd):
+    """fs_write creates new files with the usual permissions, not the temporary file's."""
+    test_file = tmp_wd / "new.txt"
+
+    main.fs_write(str(test_file), "hello")
+
+    assert test_file.stat().st_mode & 0o777 == 0o666 & ~main.umask
+
+
+def test_fs_write_concurrent(tmp_wd):
+    """fs_write to the same file from several threads leaves one complete write and no temporary files."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    test_file = tmp_wd / "test.txt"
+    contents = [str(i) * 10000 for i in range(10)]
+
+    with ThreadPoolExecutor(10) as pool:
+        results = list(pool.map(lambda c: main.fs_write(str(test_file), c), contents))
+
+    assert all("Successfully wrote" in r for r in results)
+    assert test_file.read_text() in contents
+    assert [p.name for p in tmp_wd.iterdir()] == ["test.txt"]
+
+
+@pytest.mark.parametrize("failing", ['ai.main.write_all', 'os.replace'])
+def test_fs_write_failure_cleans_up(tmp_wd, monkeypatch, failing):
+    """A failed fs_write leaves the original file as it was and no temporary file behind."""
+    test_file = tmp_wd / "test.txt"
+    test_file.write_text("old")
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(failing, fail)
+
+    result = main.fs_write(str(test_file), "new")
+
+    assert "disk full" in result
+    assert test_file.read_text() == "old"
+    assert [p.name for p in tmp_wd.iterdir()] == ["test.txt"]
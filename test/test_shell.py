@@ -55,7 +55,7 @@ def test_shell_command_never_allow(mock_subprocess, monkeypatch):
 
 def test_shell_command_already_forbidden(mock_subprocess):
     """shell rejects command already in forbidden list."""
-    main.shell_forbidden.append('blocked')
+    main.shell_forbidden.add('blocked')
 
     result = main.shell('blocked', ['args'])
 
@@ -66,7 +66,7 @@ def test_shell_command_already_forbidden(mock_subprocess):
 
 def test_shell_command_already_allowed(mock_subprocess):
     """shell runs command already in allowed list without prompting."""
-    main.shell_allowed.append('trusted')
+    main.shell_allowed.add('trusted')
 
     result = main.shell('trusted', ['args'])
 
@@ -122,3 +122,23 @@ def test_shell_arguments_passed_correctly(mock_subprocess, monkeypatch):
 
     call_args = mock_subprocess.call_args[0][0]
     assert call_args == ['cmd', 'arg1', 'arg2', 'arg3']
+
+
+def test_shell_invalid_utf8_output(monkeypatch):
+    """shell replaces undecodable bytes in command output."""
+    main.shell_allowed.add('printf')
+
+    result = main.shell('printf', ['ok \\377'])
+
+    assert result == "Success (exit code 0):\nok �"
+
+
+def test_shell_truncated_output(monkeypatch):
+    """shell keeps only the tail of long command output."""
+    monkeypatch.setattr('ai.main.shell_max_output', 10)
+    main.shell_allowed.add('seq')
+
+    result = main.shell('seq', ['100'])
+
+    expected = "".join(f"{n}\n" for n in range(1, 101))[-10:]
+    assert result == f"Success (exit code 0):\n(truncated, showing the last 10 bytes)\n{expected}"
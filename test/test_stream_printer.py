@@ -0,0 +1,69 @@
+import pytest
+from ai import main
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controlled time.monotonic(), advanced by setting `now`."""
+    class Clock:
+        now = 0.0
+
+    monkeypatch.setattr('ai.main.time.monotonic', lambda: Clock.now)
+    return Clock
+
+
+def test_stream_printer_holds_partial_lines(capsys, clock):
+    """StreamPrinter holds text back until a line is complete."""
+    printer = main.StreamPrinter(interval=1, size=100)
+
+    printer.write("hello ")
+    printer.write("world")
+    assert capsys.readouterr().out == ""
+
+    printer.write("!\nmore")
+    assert capsys.readouterr().out == "hello world!\nmore"
+
+
+def test_stream_printer_flushes_on_size(capsys, clock):
+    """StreamPrinter prints once enough text is pending, even without a newline."""
+    printer = main.StreamPrinter(interval=1, size=10)
+
+    printer.write("12345")
+    assert capsys.readouterr().out == ""
+
+    printer.write("67890")
+    assert capsys.readouterr().out == "1234567890"
+
+
+def test_stream_printer_flushes_on_interval(capsys, clock):
+    """StreamPrinter prints held text once the interval has passed since the last flush."""
+    printer = main.StreamPrinter(interval=1, size=100)
+
+    printer.write("a")
+    clock.now = 0.5
+    printer.write("b")
+    assert capsys.readouterr().out == ""
+
+    clock.now = 1.0
+    printer.write("c")
+    assert capsys.readouterr().out == "abc"
+
+
+def test_stream_printer_flush(capsys, clock):
+    """StreamPrinter.flush() prints whatever is held back."""
+    printer = main.StreamPrinter(interval=1, size=100)
+
+    printer.write("partial")
+    printer.flush()
+
+    assert capsys.readouterr().out == "partial"
+
+
+def test_tool_call_flushes_stream(capsys, clock, monkeypatch):
+    """Text streamed before a tool call is printed before the call is announced."""
+    monkeypatch.setattr('ai.main.stream', main.StreamPrinter(interval=1, size=100))
+
+    main.stream.write("let me check")
+    main.fs_pwd()
+
+    assert capsys.readouterr().out.startswith("let me check! fs_pwd")
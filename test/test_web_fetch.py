@@ -0,0 +1,107 @@
+import pytest
+from ai import main
+
+
+def response(mock_http):
+    return mock_http.get.return_value.__enter__.return_value
+
+
+def test_web_fetch_text(mock_http):
+    """web_fetch returns plain text content."""
+    result = main.web_fetch(url="https://example.com/file.txt")
+
+    assert result == "Test content"
+
+
+def test_web_fetch_reuses_session(mock_http):
+    """web_fetch sends every request through the same session, with a timeout."""
+    main.web_fetch(url="https://example.com/a.txt")
+    main.web_fetch(url="https://example.com/b.txt")
+
+    assert mock_http.get.call_count == 2
+    assert mock_http.get.call_args.kwargs["timeout"] == main.web_fetch_timeout
+
+
+def test_web_fetch_unsupported_type(mock_http):
+    """web_fetch returns error for unsupported content types."""
+    response(mock_http).headers = {"content-type": "image/png"}
+
+    result = main.web_fetch(url="https://example.com/image.png")
+
+    assert result.startswith("Error:")
+    assert "image/png" in result
+
+
+def test_web_fetch_too_long(mock_http, monkeypatch):
+    """web_fetch returns error when the response is over the size limit."""
+    monkeypatch.setattr('ai.main.web_fetch_max_size', 10)
+    response(mock_http).chunks = [b"0123456789", b"0123456789"]
+
+    result = main.web_fetch(url="https://example.com/big.txt")
+
+    assert result.startswith("Error:")
+    assert "over the limit" in result
+
+
+def test_web_session_created_on_first_use(monkeypatch):
+    """The HTTP session is created once, on first use."""
+    monkeypatch.setattr('ai.main.web_session', None)
+
+    session = main.get_web_session()
+
+    assert session is main.get_web_session()
+    assert session.get_adapter('https://example.com').max_retries.total == 2
+
+
+def test_web_session_created_once_across_threads(monkeypatch):
+    """Threads asking for the HTTP session at the same time share a single one."""
+    import time, requests
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setattr('ai.main.web_session', None)
+    created = []
+
+    class SlowSession(requests.Session):
+        def __init__(self):
+            created.append(self)
+            time.sleep(0.01)
+            super().__init__()
+
+    monkeypatch.setattr('requests.Session', SlowSession)
+
+    with ThreadPoolExecutor(8) as pool:
+        sessions = list(pool.map(lambda _: main.get_web_session(), range(8)))
+
+    assert len(created) == 1
+    assert all(session is created[0] for session in sessions)
+
+
+def test_web_fetch_split_characters(mock_http):
+    """web_fetch decodes characters split across chunks."""
+    response(mock_http).chunks = ["añb".encode()[:2], "añb".encode()[2:]]
+
+    result = main.web_fetch(url="https://example.com/file.txt")
+
+    assert result == "añb"
+
+
+def test_web_fetch_text_too_long(mock_http, monkeypatch):
+    """web_fetch stops reading text as soon as it's over the text limit."""
+    monkeypatch.setattr('ai.main.web_fetch_max_text_length', 10)
+    chunks = iter([b"0123456789", b"0123456789", b"unreachable"])
+    response(mock_http).iter_content.side_effect = lambda chunk_size: chunks
+
+    result = main.web_fetch(url="https://example.com/big.txt")
+
+    assert result.startswith("Error:")
+    assert "over the limit" in result
+    assert next(chunks) == b"unreachable"
+
+
+def test_web_fetch_content_type_case(mock_http):
+    """web_fetch accepts content types regardless of case."""
+    response(mock_http).headers = {"content-type": "Text/Plain; charset=utf-8"}
+
+    result = main.web_fetch(url="https://example.com/file.txt")
+
+    assert result == "Test content"
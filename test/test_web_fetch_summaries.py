@@ -0,0 +1,37 @@
+import pytest
+from ai import main
+
+
+def test_web_fetch_summaries(mock_kagi):
+    """web_fetch_summaries returns a summary per URL, in order."""
+    mock_kagi.summarize.side_effect = lambda url, **kwargs: {"data": {"output": f"Summary of {url}"}}
+
+    result = main.web_fetch_summaries(urls=["https://a.com", "https://b.com"])
+
+    assert result == (
+        "https://a.com\nSummary of https://a.com\n\n"
+        "https://b.com\nSummary of https://b.com"
+    )
+
+
+def test_web_fetch_summaries_partial_failure(mock_kagi):
+    """web_fetch_summaries reports failed URLs without failing the rest."""
+    def summarize(url, **kwargs):
+        if url == "https://bad.com":
+            raise ValueError("boom")
+        return {"data": {"output": "Test summary"}}
+
+    mock_kagi.summarize.side_effect = summarize
+
+    result = main.web_fetch_summaries(urls=["https://bad.com", "https://good.com"])
+
+    assert "https://bad.com\nError: boom" in result
+    assert "https://good.com\nTest summary" in result
+
+
+def test_web_fetch_summaries_empty(mock_kagi):
+    """web_fetch_summaries returns error for an empty list."""
+    result = main.web_fetch_summaries(urls=[])
+
+    assert result.startswith("Error:")
+    mock_kagi.summarize.assert_not_called()
@@ -0,0 +1,145 @@
+import pytest
+from ai import main
+
+
+def test_web_search_formats_results(mock_kagi):
+    """web_search returns numbered results."""
+    result = main.web_search(query="test")
+
+    assert result.startswith("1: Test Result")
+    assert "https://example.com" in result
+    assert "Published Date: 2024-01-01" in result
+    assert "Test snippet" in result
+
+
+def test_web_search_cached(mock_kagi):
+    """web_search reuses cached results for repeated queries."""
+    first = main.web_search(query="test")
+    second = main.web_search(query="test")
+
+    assert first == second
+    mock_kagi.search.assert_called_once_with("test")
+
+
+def test_web_search_cached_across_sessions(mock_kagi, monkeypatch):
+    """web_search reuses results cached on disk by a previous session."""
+    main.web_search(query="test")
+
+    monkeypatch.setattr('ai.main.web_cache_memory', {})
+    monkeypatch.setattr('ai.main.web_cache_db', None)
+    main.web_search(query="test")
+
+    mock_kagi.search.assert_called_once_with("test")
+
+
+def test_web_search_cache_expired(mock_kagi, monkeypatch):
+    """web_search queries again once cached results expire."""
+    main.web_search(query="test")
+
+    now = main.time.time()
+    monkeypatch.setattr('ai.main.time.time', lambda: now + 2 * 60 * 60)
+    main.web_search(query="test")
+
+    assert mock_kagi.search.call_count == 2
+
+
+def test_web_search_cache_purges_expired(mock_kagi, monkeypatch):
+    """Expired results are deleted from disk when the next session opens the cache."""
+    main.web_search(query="old")
+
+    now = main.time.time()
+    monkeypatch.setattr('ai.main.time.time', lambda: now + 2 * 60 * 60)
+    monkeypatch.setattr('ai.main.web_cache_memory', {})
+    monkeypatch.setattr('ai.main.web_cache_db', None)
+    main.web_search(query="new")
+
+    keys = [key for key, in main.web_cache().execute("SELECT key FROM cache")]
+    assert len(keys) == 1
+    assert keys[0].endswith(":new")
+
+
+def test_web_search_corrupt_cache(mock_kagi, web_cache):
+    """web_search works without the disk cache when the database is corrupt."""
+    web_cache.write_bytes(b"not a database" * 100)
+
+    result = main.web_search(query="test")
+
+    assert result.startswith("1: Test Result")
+    mock_kagi.search.assert_called_once_with("test")
+
+
+def test_web_search_unwritable_cache(mock_kagi, tmp_path, monkeypatch):
+    """web_search works without the disk cache when its directory can't be created."""
+    (tmp_path / "blocked").write_text("a file where the directory should be")
+    monkeypatch.setattr('ai.main.web_cache_path', tmp_path / "blocked" / "web.sqlite")
+
+    result = main.web_search(query="test")
+
+    assert result.startswith("1: Test Result")
+    mock_kagi.search.assert_called_once_with("test")
+
+
+def test_web_search_cache_write_fails(mock_kagi, monkeypatch):
+    """web_search returns what it fetched even if the result can't be written to disk."""
+    db = main.web_cache()
+    db.execute("CREATE TRIGGER readonly BEFORE INSERT ON cache BEGIN SELECT RAISE(ABORT, 'readonly'); END")
+
+    result = main.web_search(query="test")
+
+    assert result.startswith("1: Test Result")
+
+
+def test_web_search_empty_query(mock_kagi):
+    """web_search returns error for empty query."""
+    result = main.web_search(query="")
+
+    assert result.startswith("Error:")
+    assert "cannot be missing or empty" in result
+    mock_kagi.search.assert_not_called()
+
+
+def test_kagi_client_created_on_first_use(monkeypatch):
+    """The Kagi client is created once, on first use."""
+    monkeypatch.setenv('KAGI_API_KEY', 'test-key')
+    monkeypatch.setattr('ai.main.kagi_client', None)
+
+    client = main.get_kagi_client()
+
+    assert client is main.get_kagi_client()
+    assert client.session.get_adapter('https://kagi.com').max_retries.total == 2
+
+
+def test_kagi_client_created_once_across_threads(monkeypatch):
+    """Threads asking for the Kagi client at the same time share a single one."""
+    import time, kagiapi
+    from concurrent.futures import ThreadPoolExecutor
+
+    monkeypatch.setenv('KAGI_API_KEY', 'test-key')
+    monkeypatch.setattr('ai.main.kagi_client', None)
+    created = []
+
+    class SlowClient(kagiapi.KagiClient):
+        def __init__(self, *args):
+            created.append(self)
+            time.sleep(0.01)
+            super().__init__(*args)
+
+    monkeypatch.setattr('kagiapi.KagiClient', SlowClient)
+
+    with ThreadPoolExecutor(8) as pool:
+        clients = list(pool.map(lambda _: main.get_kagi_client(), range(8)))
+
+    assert len(created) == 1
+    assert all(client is created[0] for client in clients)
+
+
+def test_web_search_missing_api_key(monkeypatch):
+    """web_search returns error when KAGI_API_KEY is not set."""
+    monkeypatch.delenv('KAGI_API_KEY', raising=False)
+    monkeypatch.setattr('ai.main.kagi_client', None)
+
+    result = main.web_search(query="test")
+
+    assert result.startswith("Error:")
+    assert "KAGI_API_KEY is not set" in result
+    assert main.kagi_client is None
@@ -0,0 +1,34 @@
+import pytest
+from ai import main
+
+
+def test_web_searches(mock_kagi):
+    """web_searches returns results per query, in order."""
+    result = main.web_searches(queries=["first", "second"])
+
+    assert result.startswith("# first\n1: Test Result")
+    assert "\n\n# second\n1: Test Result" in result
+    assert mock_kagi.search.call_count == 2
+
+
+def test_web_searches_partial_failure(mock_kagi):
+    """web_searches reports failed queries without failing the rest."""
+    def failing_search(query, **kwargs):
+        if query == "bad":
+            raise ValueError("boom")
+        return mock_kagi.search.return_value
+
+    mock_kagi.search.side_effect = failing_search
+
+    result = main.web_searches(queries=["bad", "good"])
+
+    assert "# bad\nError: boom" in result
+    assert "# good\n1: Test Result" in result
+
+
+def test_web_searches_empty(mock_kagi):
+    """web_searches returns error for an empty list."""
+    result = main.web_searches(queries=[])
+
+    assert result.startswith("Error:")
+    mock_kagi.search.assert_not_called()